@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+from PIL import Image, GifImagePlugin
+import sys
+import os
+
+from simulate2 import (simulated_tile_color, create_tile_with_texture,
+                       mosaic_canvas_size, tile_position)
+from sheets import SHEET_SIZE
+from output_writer import OutputWriter
+
+class GifStream:
+    """
+    Animated GIF written frame by frame. Every frame after the first only carries
+    the rectangle that changed, so nothing but the current canvas is kept in memory.
+    Frames must be 'P' images sharing the palette of the first frame.
+    """
+
+    def __init__(self, path, first_frame, duration, loop=0):
+        self.fp = open(path, 'wb')
+        try:
+            header, _ = GifImagePlugin.getheader(first_frame.copy(), info={'loop': loop, 'optimize': False})
+            self.fp.write(b''.join(header))
+            self.add(first_frame, (0, 0), duration)
+        except BaseException:
+            self.fp.close()
+            raise
+
+    def add(self, frame, offset, duration):
+        for data in GifImagePlugin.getdata(frame, offset, duration=duration):
+            self.fp.write(data)
+
+    def close(self):
+        self.fp.write(b';')  # GIF trailer
+        self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Already failing: release the file but keep the original error
+            self.fp.close()
+        return False
+
+def build_order(width, height, order='rows', sheet_size=SHEET_SIZE):
+    """Installation order as a list of steps, each a list of (x, y) tiles placed together"""
+    if order == 'tiles':
+        return [[(x, y)] for y in range(height) for x in range(width)]
+    if order == 'rows':
+        return [[(x, y) for x in range(width)] for y in range(height)]
+    if order == 'sheets':
+        return [[(x, y)
+                 for y in range(top, min(height, top + sheet_size))
+                 for x in range(left, min(width, left + sheet_size))]
+                for top in range(0, height, sheet_size)
+                for left in range(0, width, sheet_size)]
+    raise ValueError(f"Unknown build order: {order} (use tiles, rows or sheets)")
+
+def gif_palette(tile_colors, grout_color):
+    """
+    Fixed 'P' palette image for GIF frames: the grout plus every tile color with
+    its edge shade and highlight, so the textured tiles keep their look.
+    """
+    colors = [grout_color]
+    for color in sorted(set(tile_colors)):
+        colors.append(color)
+        colors.append(tuple(int(c * 0.95) for c in color))
+        colors.append(tuple(int(c * 0.98) for c in color))
+        colors.append(tuple(min(255, int(c * 1.05)) for c in color))
+    colors = list(dict.fromkeys(colors))[:256]
+    colors += [grout_color] * (256 - len(colors))
+    palette = Image.new('P', (1, 1))
+    palette.putpalette([c for color in colors for c in color])
+    return palette
+
+def create_build_animation(input_path, output_path=None, order='rows', steps_per_frame=1,
+                           tile_size=12, grout_width=1, grout_color=(128, 128, 128),
+                           tile_style='square', frame_duration=40, hold_duration=2000):
+    """
+    Create a time-lapse of the wall being installed.
+    One canvas is reused for the whole sequence and only the tiles added since the
+    previous frame are painted. A .gif output is streamed as delta frames; any other
+    output path is treated as a directory that receives a numbered PNG sequence.
+    """
+    if steps_per_frame < 1:
+        raise ValueError(f"steps_per_frame must be at least 1, got {steps_per_frame}")
+
+    # Mosaic dimensions in tiles
+    MOSAIC_WIDTH = 42
+    MOSAIC_HEIGHT = 67
+
+    # Open and prepare the input image
+    img = Image.open(input_path)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    # Resize to mosaic dimensions
+    pixelated = img.resize((MOSAIC_WIDTH, MOSAIC_HEIGHT), Image.Resampling.LANCZOS)
+
+    # Decide every tile color up front, the same way the simulation does
+    tile_colors = {(x, y): simulated_tile_color(pixelated.getpixel((x, y)))
+                   for y in range(MOSAIC_HEIGHT) for x in range(MOSAIC_WIDTH)}
+
+    steps = build_order(MOSAIC_WIDTH, MOSAIC_HEIGHT, order)
+    frames = [sum(steps[i:i + steps_per_frame], []) for i in range(0, len(steps), steps_per_frame)]
+
+    output_width, output_height = mosaic_canvas_size(MOSAIC_WIDTH, MOSAIC_HEIGHT, tile_size, grout_width)
+    canvas = Image.new('RGB', (output_width, output_height), grout_color)
+
+    if output_path is None:
+        base, ext = os.path.splitext(input_path)
+        output_path = f"{base}_build_{order}.gif"
+
+    print(f"Creating build animation ({order}, {len(frames):,} frames)...")
+    print(f"Frame size: {output_width}x{output_height} pixels")
+
+    as_gif = output_path.lower().endswith('.gif')
+    if as_gif:
+        palette = gif_palette(tile_colors.values(), grout_color)
+        output = GifStream(output_path, canvas.quantize(palette=palette, dither=Image.Dither.NONE),
+                           frame_duration)
+    else:
+        os.makedirs(output_path, exist_ok=True)
+        output = OutputWriter()
+
+    # Closes the GIF or flushes pending frame writes even if rendering fails
+    with output:
+        if not as_gif:
+            output.save(canvas.copy(), os.path.join(output_path, 'frame_00000.png'))
+
+        for frame_number, tiles in enumerate(frames, start=1):
+            # Paint only the newly installed tiles and track the area they cover
+            left, top, right, bottom = output_width, output_height, 0, 0
+            for x, y in tiles:
+                tile = create_tile_with_texture(tile_size, tile_colors[(x, y)], rounded=(tile_style == 'penny'))
+                pos_x, pos_y = tile_position(x, y, tile_size, grout_width)
+                if tile.mode == 'RGBA':
+                    canvas.paste(tile, (pos_x, pos_y), tile)
+                else:
+                    canvas.paste(tile, (pos_x, pos_y))
+                left, top = min(left, pos_x), min(top, pos_y)
+                right, bottom = max(right, pos_x + tile_size), max(bottom, pos_y + tile_size)
+
+            duration = hold_duration if frame_number == len(frames) else frame_duration
+            if as_gif:
+                changed = canvas.crop((left, top, right, bottom)).quantize(palette=palette, dither=Image.Dither.NONE)
+                output.add(changed, (left, top), duration)
+            else:
+                output.save(canvas.copy(), os.path.join(output_path, f"frame_{frame_number:05d}.png"))
+
+            # Progress indicator
+            if frame_number % 100 == 0:
+                print(f"Progress: {frame_number / len(frames) * 100:.1f}%")
+
+    print(f"\nBuild animation saved to: {output_path}")
+    print(f"Frames: {len(frames) + 1:,}")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python animate.py <input_image> [order] [steps_per_frame] [output.gif|frames_dir]")
+        print("Orders: rows (default), sheets, tiles")
+        print("Example: python animate.py image.jpg sheets")
+        print("         python animate.py image.jpg tiles 1 frames/")
+        sys.exit(1)
+
+    input_file = sys.argv[1]
+    build = sys.argv[2] if len(sys.argv) > 2 else 'rows'
+    per_frame = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    output_file = sys.argv[4] if len(sys.argv) > 4 else None
+
+    create_build_animation(input_file, output_file, order=build, steps_per_frame=per_frame)
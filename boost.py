@@ -1,4 +1,7 @@
 import sys
+import os
+import json
+import numpy as np
 from PIL import Image, ImageDraw
 
 # Your confirmed tile palette
@@ -32,17 +35,104 @@ TILE_COLORS = [
 # Define which indices are "browns" (to exclude in bouquet)
 BROWN_INDICES = [9, 10, 11, 12, 19, 20]  # Beige, Taupe, Brown, Dark Brown, Peach, Terracotta
 
-# Create a non-brown palette for the bouquet
-NON_BROWN_PALETTE = [c for i, c in enumerate(TILE_COLORS) if i not in BROWN_INDICES]
+# Default region layout: the bouquet rectangle drawn with the non-brown palette
+DEFAULT_REGIONS = {
+    "regions": [
+        {
+            "name": "bouquet",
+            "polygon": [[2, 2], [16, 2], [16, 18], [2, 18]],  # (left, top, right, bottom) in tile coordinates
+            "exclude": BROWN_INDICES,
+        }
+    ]
+}
 
-def quantize_color_to_palette(rgb, palette):
-    def dist(c1, c2):
-        return sum((a-b)**2 for a, b in zip(c1, c2))
-    return min(palette, key=lambda c: dist(rgb, c))
+# Pixels quantized per batch, keeps the (pixels x palette) distance table small
+QUANTIZE_CHUNK = 1 << 16
+
+def region_weights(region, palette=TILE_COLORS):
+    """
+    Build the per-palette weight row for a region definition.
+    A weight of 0 removes the color, values above 1 favour it.
+    """
+    if "palette" in region:
+        weights = np.zeros(len(palette))
+        weights[region["palette"]] = 1.0
+    else:
+        weights = np.ones(len(palette))
+    weights[region.get("exclude", [])] = 0.0
+    for idx, weight in region.get("weights", {}).items():
+        if weights[int(idx)] > 0:
+            weights[int(idx)] = float(weight)
+    if not weights.any():
+        raise ValueError(f"Region {region.get('name', '?')!r} has no usable palette colors")
+    return weights
+
+def load_regions(config, width, height, base_dir="."):
+    """
+    Rasterize a region config into a label grid and a weight table.
+
+    The config is a dict with a list of "regions". Each region is bound either to
+    a "label" value of the optional "label_map" image or to a "polygon" in tile
+    coordinates, and picks its colors with "palette", "exclude" and "weights"
+    (all indices into TILE_COLORS). Later regions are painted over earlier ones.
+    Label 0 is the background and uses the full palette.
+    """
+    regions = config.get("regions", [])
+    if len(regions) > 255:
+        raise ValueError("At most 255 regions are supported")
+
+    labels = Image.new('L', (width, height), 0)
+    weights = np.ones((len(regions) + 1, len(TILE_COLORS)))
+
+    label_lookup = np.zeros(256, dtype=np.uint8)
+    for region_id, region in enumerate(regions, start=1):
+        weights[region_id] = region_weights(region)
+        if "label" in region:
+            name = region.get('name', '?')
+            if "label_map" not in config:
+                raise ValueError(f"Region {name!r} uses a label but the config has no label_map")
+            if not 0 <= region["label"] <= 255:
+                raise ValueError(f"Region {name!r} label {region['label']} is outside 0-255")
+            label_lookup[region["label"]] = region_id
+
+    if "label_map" in config:
+        label_map = Image.open(os.path.join(base_dir, config["label_map"]))
+        if label_map.mode not in ('L', 'P'):
+            label_map = label_map.convert('L')
+        label_map = label_map.resize((width, height), Image.Resampling.NEAREST)
+        labels = Image.fromarray(label_lookup[np.asarray(label_map)], 'L')
+
+    draw = ImageDraw.Draw(labels)
+    for region_id, region in enumerate(regions, start=1):
+        if "polygon" in region:
+            draw.polygon([tuple(p) for p in region["polygon"]], fill=region_id)
+
+    return np.asarray(labels), weights
+
+def quantize_by_region(pixels, labels, weights, palette=TILE_COLORS):
+    """
+    Quantize an (H, W, 3) pixel array to palette indices, every pixel restricted
+    to the colors of its region. All regions are handled in the same batched pass.
+    """
+    palette = np.asarray(palette, dtype=np.int32)
+    flat_pixels = pixels.reshape(-1, 3).astype(np.int32)
+    flat_labels = labels.reshape(-1)
+    indices = np.empty(len(flat_pixels), dtype=np.uint8)
+
+    for start in range(0, len(flat_pixels), QUANTIZE_CHUNK):
+        stop = start + QUANTIZE_CHUNK
+        diff = flat_pixels[start:stop, None, :] - palette[None, :, :]
+        dist = (diff * diff).sum(axis=2)
+        w = weights[flat_labels[start:stop]]
+        cost = np.full(dist.shape, np.inf)
+        np.divide(dist, w, out=cost, where=w > 0)
+        indices[start:stop] = cost.argmin(axis=1)
+
+    return indices.reshape(labels.shape)
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python boost.py <input_image.png>")
+        print("Usage: python boost.py <input_image.png> [regions.json]")
         sys.exit(1)
     input_path = sys.argv[1]
     output_path = input_path.replace('.png', '_bouquet_colorful.png')
@@ -50,28 +140,26 @@ def main():
     MOSAIC_WIDTH = 42
     MOSAIC_HEIGHT = 67
 
-    # Define the bouquet rectangle (adjust as needed)
-    bouquet_rect = (2, 2, 16, 18)  # (left, top, right, bottom) in tile coordinates
+    # Load region definitions (defaults to the bouquet rectangle)
+    if len(sys.argv) > 2:
+        regions_path = sys.argv[2]
+        with open(regions_path) as f:
+            config = json.load(f)
+        base_dir = os.path.dirname(regions_path)
+    else:
+        config, base_dir = DEFAULT_REGIONS, "."
 
     img = Image.open(input_path)
     if img.mode != 'RGB':
         img = img.convert('RGB')
     pixelated = img.resize((MOSAIC_WIDTH, MOSAIC_HEIGHT), Image.Resampling.LANCZOS)
 
-    quantized_pixels = []
-    for y in range(MOSAIC_HEIGHT):
-        for x in range(MOSAIC_WIDTH):
-            rgb = pixelated.getpixel((x, y))
-            # Check if in bouquet rectangle
-            if bouquet_rect[0] <= x <= bouquet_rect[2] and bouquet_rect[1] <= y <= bouquet_rect[3]:
-                palette = NON_BROWN_PALETTE
-            else:
-                palette = TILE_COLORS
-            quantized_pixels.append(quantize_color_to_palette(rgb, palette))
-
-    # Create new image with quantized colors
-    quantized_img = Image.new('RGB', (MOSAIC_WIDTH, MOSAIC_HEIGHT))
-    quantized_img.putdata(quantized_pixels)
+    labels, weights = load_regions(config, MOSAIC_WIDTH, MOSAIC_HEIGHT, base_dir)
+    indices = quantize_by_region(np.asarray(pixelated), labels, weights)
+
+    # Create new image with quantized colors, kept as palette indices ('P' mode)
+    quantized_img = Image.fromarray(indices, 'L')
+    quantized_img.putpalette([c for color in TILE_COLORS for c in color])
 
     # Save the result
     quantized_img = quantized_img.resize((MOSAIC_WIDTH*10, MOSAIC_HEIGHT*10), Image.Resampling.NEAREST)
@@ -1,13 +1,17 @@
 #!/usr/bin/env python3
 from PIL import Image
+from contextlib import nullcontext
 import sys
 import os
 
-def create_exact_color_grid(input_path, output_prefix=None):
+from output_writer import OutputWriter
+
+def create_exact_color_grid(input_path, output_prefix=None, writer=None):
     """
     Create two versions of the mosaic grid:
     1. A 1:1 pixel representation (42x67)
     2. A larger version with 10x10 squares per color for easy viewing
+    Images are saved through writer (an OutputWriter) when one is given.
     """
     # Fixed mosaic dimensions
     MOSAIC_WIDTH = 42
@@ -22,24 +26,12 @@ def create_exact_color_grid(input_path, output_prefix=None):
     # Resize to mosaic dimensions - this does the color averaging
     pixelated = img.resize((MOSAIC_WIDTH, MOSAIC_HEIGHT), Image.Resampling.LANCZOS)
     
-    # Create the preview image (scaled up version)
+    # Create the preview image (scaled up version) - each color becomes a
+    # PREVIEW_SCALE x PREVIEW_SCALE square. These colors are unquantized, so
+    # the grid stays RGB rather than palette-indexed.
     preview_width = MOSAIC_WIDTH * PREVIEW_SCALE
     preview_height = MOSAIC_HEIGHT * PREVIEW_SCALE
-    preview = Image.new('RGB', (preview_width, preview_height))
-    
-    # Fill both images with the exact colors
-    for y in range(MOSAIC_HEIGHT):
-        for x in range(MOSAIC_WIDTH):
-            # Get the exact color for this position
-            color = pixelated.getpixel((x, y))
-            
-            # For the preview, fill a PREVIEW_SCALE x PREVIEW_SCALE square
-            for py in range(PREVIEW_SCALE):
-                for px in range(PREVIEW_SCALE):
-                    preview.putpixel(
-                        (x * PREVIEW_SCALE + px, y * PREVIEW_SCALE + py),
-                        color
-                    )
+    preview = pixelated.resize((preview_width, preview_height), Image.Resampling.NEAREST)
     
     # Determine output paths
     if output_prefix is None:
@@ -49,8 +41,9 @@ def create_exact_color_grid(input_path, output_prefix=None):
     exact_path = f"{output_prefix}_exact.png"
     preview_path = f"{output_prefix}_exact_preview.png"
     
-    pixelated.save(exact_path)
-    preview.save(preview_path)
+    with (OutputWriter() if writer is None else nullcontext(writer)) as writer:
+        writer.save(pixelated, exact_path)
+        preview_path = writer.save(preview, preview_path, preview=True)
     
     print(f"\nExact color grid saved to: {exact_path}")
     print(f"Preview version saved to: {preview_path}")
@@ -58,9 +51,15 @@ def create_exact_color_grid(input_path, output_prefix=None):
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python exact_colors.py <input_image>")
+        print("Usage: python exact_colors.py <input_image> [preview_format] [compress_level]")
+        print("Preview formats: png (default), webp, jpeg")
+        print("Compress level: PNG compression 0-9 (default: 6, lower is faster)")
         print("Example: python exact_colors.py flower-thrower.jpg")
         sys.exit(1)
     
     input_file = sys.argv[1]
-    create_exact_color_grid(input_file) 
\ No newline at end of file
+    preview_format = sys.argv[2] if len(sys.argv) > 2 else 'png'
+    compress_level = int(sys.argv[3]) if len(sys.argv) > 3 else 6
+    
+    with OutputWriter(compress_level=compress_level, preview_format=preview_format) as writer:
+        create_exact_color_grid(input_file, writer=writer) 
\ No newline at end of file
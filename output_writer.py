@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import os
+
+PREVIEW_FORMATS = {'png': '.png', 'webp': '.webp', 'jpeg': '.jpg'}
+
+class OutputWriter:
+    """
+    Encode and save finished images on a small pool of background threads.
+
+    Pillow releases the GIL while compressing, so rendering of the next image can
+    continue while earlier ones are written. At most max_pending images are held
+    in the queue; save() blocks once that many are waiting. Errors from earlier
+    writes are raised from the next save() call, and from close() at the latest.
+    """
+
+    def __init__(self, workers=2, max_pending=4, compress_level=6, preview_format='png', preview_quality=85):
+        if preview_format not in PREVIEW_FORMATS:
+            raise ValueError(f"Unknown preview format: {preview_format} (use png, webp or jpeg)")
+        if not 0 <= compress_level <= 9:
+            raise ValueError(f"PNG compress level must be between 0 and 9, got {compress_level}")
+        self.compress_level = compress_level
+        self.preview_format = preview_format
+        self.preview_quality = preview_quality
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='output-writer')
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.futures = []
+
+    def save(self, img, path, preview=False):
+        """
+        Queue img to be written to path and return the path actually used.
+        Previews are written in preview_format, which may change the file extension.
+        The image must not be modified after it is handed over.
+        """
+        self.raise_errors()
+
+        options = {}
+        if preview and self.preview_format != 'png':
+            path = os.path.splitext(path)[0] + PREVIEW_FORMATS[self.preview_format]
+            options['quality'] = self.preview_quality
+            if self.preview_format == 'jpeg' and img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+        elif path.lower().endswith('.png'):
+            options['compress_level'] = self.compress_level
+        elif path.lower().endswith(('.jpg', '.jpeg')) and img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')  # Palette images cannot be stored as JPEG
+
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(img.save, path, **options)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda f: self.slots.release())
+        self.futures.append(future)
+        return path
+
+    def raise_errors(self):
+        """Raise the first error from any write that has already finished"""
+        pending = []
+        for future in self.futures:
+            if not future.done():
+                pending.append(future)
+            elif future.exception() is not None:
+                raise future.exception()
+        self.futures = pending
+
+    def close(self):
+        """Wait for all queued writes and raise the first error, if any"""
+        self.executor.shutdown(wait=True)
+        futures, self.futures = self.futures, []
+        for future in futures:
+            if future.exception() is not None:
+                raise future.exception()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Already failing: let pending writes finish but keep the original error
+            self.executor.shutdown(wait=True)
+        return False
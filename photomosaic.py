@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+from PIL import Image, ImageOps
+from collections import OrderedDict
+import numpy as np
+import tempfile
+import math
+import sys
+import os
+
+from simulate2 import mosaic_canvas_size, tile_position
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif', '.tif', '.tiff')
+FEATURE_SIZE = 4          # Each image is described by a 4x4 RGB thumbnail
+INDEX_FILENAME = '.mosaic_index.npz'
+BUCKET_SIZE = 32          # Width of a mean-color bucket in RGB units (8 buckets per channel)
+INDEX_SAVE_INTERVAL = 500 # Newly indexed images between index saves
+
+def image_features(img):
+    """Low-res feature vector (FEATURE_SIZE x FEATURE_SIZE x RGB, flattened) for an image"""
+    img.draft('RGB', (FEATURE_SIZE * 8, FEATURE_SIZE * 8))  # Fast JPEG downscale on decode
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img = ImageOps.fit(img, (FEATURE_SIZE, FEATURE_SIZE), Image.Resampling.BOX)
+    return np.asarray(img, dtype=np.float32).reshape(-1)
+
+def mean_colors(features):
+    """Mean RGB color for each row of a feature matrix"""
+    return features.reshape(len(features), -1, 3).mean(axis=1)
+
+class ImageLibrary:
+    """
+    Feature index over a directory of images.
+
+    The index is cached next to the images and updated incrementally: only new or
+    modified files are decoded, removed files are dropped. Files that fail to decode
+    are remembered and only retried once they change.
+    """
+
+    def __init__(self, library_dir, index_path=None):
+        self.library_dir = library_dir
+        self.index_path = index_path or os.path.join(library_dir, INDEX_FILENAME)
+        self.paths = []
+        self.mtimes = np.zeros(0)
+        self.features = np.zeros((0, FEATURE_SIZE * FEATURE_SIZE * 3), dtype=np.float32)
+        self.skipped = {}  # Undecodable files and the mtimes they failed at
+        if os.path.exists(self.index_path):
+            try:
+                with np.load(self.index_path) as data:
+                    paths = list(data['paths'])
+                    mtimes = data['mtimes']
+                    features = data['features']
+                    skipped = dict(zip(data['skipped_paths'].tolist(), data['skipped_mtimes'].tolist())) \
+                        if 'skipped_paths' in data else {}
+            except Exception as e:
+                print(f"Index {self.index_path} is unreadable, rebuilding it: {e}")
+            else:
+                self.paths, self.mtimes, self.features, self.skipped = paths, mtimes, features, skipped
+
+    def __len__(self):
+        return len(self.paths)
+
+    def scan(self):
+        """Relative paths and modification times of all images in the library"""
+        found = {}
+        for root, dirs, files in os.walk(self.library_dir):
+            for name in files:
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    full_path = os.path.join(root, name)
+                    found[os.path.relpath(full_path, self.library_dir)] = os.path.getmtime(full_path)
+        return found
+
+    def update(self):
+        """
+        Bring the index in line with the library directory. Returns number of images indexed.
+        Progress is saved every INDEX_SAVE_INTERVAL images so an interrupted run is not lost.
+        """
+        found = self.scan()
+        known = {path: i for i, path in enumerate(self.paths)}
+
+        keep = [known[path] for path, mtime in found.items()
+                if path in known and self.mtimes[known[path]] == mtime]
+        skipped = {path: mtime for path, mtime in self.skipped.items() if found.get(path) == mtime}
+        new_paths = [path for path, mtime in found.items()
+                     if path not in skipped and (path not in known or self.mtimes[known[path]] != mtime)]
+
+        changed = bool(new_paths) or len(keep) != len(self.paths) or len(skipped) != len(self.skipped)
+        self.skipped = skipped
+        self.paths = [self.paths[i] for i in keep]
+        self.mtimes = np.array([found[path] for path in self.paths])
+        self.features = self.features[keep]
+
+        batch_paths = []
+        batch_features = []
+        indexed = 0
+        for i, path in enumerate(new_paths):
+            try:
+                with Image.open(os.path.join(self.library_dir, path)) as img:
+                    batch_features.append(image_features(img))
+                batch_paths.append(path)
+            except Exception as e:  # Corrupt, truncated or oversized images are skipped
+                print(f"Skipping {path}: {e}")
+                self.skipped[path] = found[path]
+            if (i + 1) % INDEX_SAVE_INTERVAL == 0 or i + 1 == len(new_paths):
+                if batch_paths:
+                    self.paths += batch_paths
+                    self.mtimes = np.concatenate([self.mtimes, [found[path] for path in batch_paths]])
+                    self.features = np.concatenate([self.features, np.stack(batch_features)])
+                    indexed += len(batch_paths)
+                    batch_paths, batch_features = [], []
+                self.save()
+                print(f"Indexed {i + 1}/{len(new_paths)} new images")
+
+        if changed and not new_paths:
+            self.save()
+        return indexed
+
+    def save(self):
+        """Write the index to a temporary file and swap it in, so an interrupted save keeps the old index"""
+        index_dir = os.path.dirname(os.path.abspath(self.index_path))
+        fd, tmp_path = tempfile.mkstemp(dir=index_dir, prefix=os.path.basename(self.index_path), suffix='.tmp')
+        try:
+            # Saving through a file object keeps np.savez from appending .npz to the path
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, paths=np.array(self.paths, dtype=str), mtimes=self.mtimes, features=self.features,
+                         skipped_paths=np.array(list(self.skipped), dtype=str),
+                         skipped_mtimes=np.array(list(self.skipped.values()), dtype=np.float64))
+            os.replace(tmp_path, self.index_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def full_path(self, image_id):
+        return os.path.join(self.library_dir, self.paths[image_id])
+
+class ColorBucketIndex:
+    """Spatial index of images bucketed on a regular grid over mean-color space"""
+
+    def __init__(self, colors):
+        self.buckets = {}
+        self.grid = 256 // BUCKET_SIZE
+        for image_id, color in enumerate(colors):
+            self.buckets.setdefault(self.bucket_of(color), set()).add(image_id)
+
+    def bucket_of(self, color):
+        return tuple(min(self.grid - 1, int(c) // BUCKET_SIZE) for c in color)
+
+    def remove(self, image_id, color):
+        self.buckets[self.bucket_of(color)].discard(image_id)
+
+    def shell(self, center, radius):
+        """Buckets at exactly Chebyshev distance radius from center"""
+        ranges = [range(max(0, c - radius), min(self.grid, c + radius + 1)) for c in center]
+        for i in ranges[0]:
+            for j in ranges[1]:
+                for k in ranges[2]:
+                    if max(abs(i - center[0]), abs(j - center[1]), abs(k - center[2])) == radius:
+                        yield (i, j, k)
+
+    def candidates(self, color, count):
+        """
+        Collect at least count image ids from the buckets nearest to color.
+        One extra shell is searched so neighbours just across a bucket edge are included.
+        """
+        center = self.bucket_of(color)
+        found = []
+        extra_shell = None
+        for radius in range(self.grid):
+            for bucket in self.shell(center, radius):
+                found.extend(self.buckets.get(bucket, ()))
+            if extra_shell is not None and radius >= extra_shell:
+                break
+            if len(found) >= count and extra_shell is None:
+                extra_shell = radius + 1
+        return found
+
+class ThumbnailCache:
+    """LRU cache of tile-sized thumbnails, bounded by total pixel memory"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.entries = OrderedDict()
+
+    def get(self, path, size):
+        key = (path, size)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        with Image.open(path) as img:
+            img.draft('RGB', (size, size))
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            thumb = ImageOps.fit(img, (size, size), Image.Resampling.LANCZOS)
+
+        self.entries[key] = thumb
+        self.used_bytes += size * size * 3
+        while self.used_bytes > self.max_bytes and len(self.entries) > 1:
+            (_, old_size), _ = self.entries.popitem(last=False)
+            self.used_bytes -= old_size * old_size * 3
+        return thumb
+
+def create_photomosaic(input_path, library_dir, output_path=None, tile_size=40, grout_width=3,
+                       grout_color=(128, 128, 128), max_uses=None, candidate_count=32, cache_mb=256,
+                       index_path=None):
+    """
+    Create a photomosaic where each tile is the best matching image from a library.
+    index_path places the feature index outside a read-only library directory.
+    """
+    # Mosaic dimensions in tiles
+    MOSAIC_WIDTH = 42
+    MOSAIC_HEIGHT = 67
+
+    library = ImageLibrary(library_dir, index_path)
+    added = library.update()
+    if len(library) == 0:
+        print(f"No images found in {library_dir}")
+        sys.exit(1)
+    print(f"Library: {len(library):,} images ({added:,} newly indexed)")
+
+    # Default repetition limit spreads usage over the library with some headroom
+    total_tiles = MOSAIC_WIDTH * MOSAIC_HEIGHT
+    if max_uses is None:
+        max_uses = max(1, math.ceil(2 * total_tiles / len(library)))
+    if max_uses * len(library) < total_tiles:
+        print(f"Library too small for {total_tiles:,} tiles with max {max_uses} uses per image")
+        sys.exit(1)
+
+    # Per-cell features at the same resolution as the library features
+    img = Image.open(input_path)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    cells = img.resize((MOSAIC_WIDTH * FEATURE_SIZE, MOSAIC_HEIGHT * FEATURE_SIZE), Image.Resampling.BOX)
+    cells = np.asarray(cells, dtype=np.float32).reshape(
+        MOSAIC_HEIGHT, FEATURE_SIZE, MOSAIC_WIDTH, FEATURE_SIZE, 3).transpose(0, 2, 1, 3, 4)
+    cells = cells.reshape(MOSAIC_HEIGHT, MOSAIC_WIDTH, -1)
+
+    colors = mean_colors(library.features)
+    index = ColorBucketIndex(colors)
+    uses = np.zeros(len(library), dtype=np.int32)
+    choice = np.full((MOSAIC_HEIGHT, MOSAIC_WIDTH), -1, dtype=np.int64)
+
+    # Pick the best match per cell, never repeating the left or top neighbour
+    for y in range(MOSAIC_HEIGHT):
+        for x in range(MOSAIC_WIDTH):
+            feature = cells[y, x]
+            neighbours = {choice[y, x - 1] if x > 0 else -1, choice[y - 1, x] if y > 0 else -1}
+            nearby = index.candidates(feature.reshape(-1, 3).mean(axis=0), candidate_count + 2)
+            candidates = np.array([i for i in nearby if i not in neighbours] or nearby)
+            dist = ((library.features[candidates] - feature) ** 2).sum(axis=1)
+            best = int(candidates[dist.argmin()])
+
+            choice[y, x] = best
+            uses[best] += 1
+            if uses[best] >= max_uses:
+                index.remove(best, colors[best])
+
+    # Place thumbnails on a grout canvas
+    output_width, output_height = mosaic_canvas_size(MOSAIC_WIDTH, MOSAIC_HEIGHT, tile_size, grout_width)
+    output = Image.new('RGB', (output_width, output_height), grout_color)
+    cache = ThumbnailCache(cache_mb * 1024 * 1024)
+
+    print("Creating photomosaic...")
+    print(f"Output size: {output_width}x{output_height} pixels")
+
+    for y in range(MOSAIC_HEIGHT):
+        for x in range(MOSAIC_WIDTH):
+            thumb = cache.get(library.full_path(choice[y, x]), tile_size)
+            output.paste(thumb, tile_position(x, y, tile_size, grout_width))
+
+        # Progress indicator
+        if (y + 1) % 10 == 0:
+            print(f"Progress: {(y + 1) / MOSAIC_HEIGHT * 100:.1f}%")
+
+    if output_path is None:
+        base, ext = os.path.splitext(input_path)
+        output_path = f"{base}_photomosaic.png"
+
+    output.save(output_path)
+
+    # Also create a smaller preview version
+    preview_width = 800
+    preview_height = int(output_height * (preview_width / output_width))
+    preview = output.resize((preview_width, preview_height), Image.Resampling.LANCZOS)
+    preview_path = output_path.replace('.png', '_preview.png')
+    preview.save(preview_path)
+
+    print(f"\nPhotomosaic saved to: {output_path}")
+    print(f"Preview version saved to: {preview_path}")
+    print(f"Total tiles: {total_tiles:,}")
+    print(f"Distinct images used: {np.count_nonzero(uses):,} (max {uses.max()} uses per image)")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python photomosaic.py <input_image> <library_dir> [max_uses|0=auto] [index_file]")
+        print("Example: python photomosaic.py image.jpg photos/")
+        print("         python photomosaic.py image.jpg /mnt/photos/ 0 photos_index.npz")
+        sys.exit(1)
+
+    input_file = sys.argv[1]
+    library = sys.argv[2]
+    max_uses = int(sys.argv[3]) if len(sys.argv) > 3 and int(sys.argv[3]) > 0 else None
+    index_file = sys.argv[4] if len(sys.argv) > 4 else None
+
+    create_photomosaic(input_file, library, max_uses=max_uses, index_path=index_file)
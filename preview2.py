@@ -1,9 +1,14 @@
 #!/usr/bin/env python3
-from PIL import Image
-from collections import Counter
+from PIL import Image, ImageDraw
+import numpy as np
 import sys
 import os
 import colorsys
+from contextlib import nullcontext
+import struct
+import zlib
+
+from output_writer import OutputWriter
 
 TILE_COLORS = [
     (232, 232, 228),  # Off White
@@ -32,6 +37,13 @@ TILE_COLORS = [
     (255, 150, 0),    # Orange
 ]
 
+TILE_NAMES = [
+    "Off White", "Light Gray", "Medium Gray", "Warm Gray", "Dark Gray", "Charcoal",
+    "Deep Charcoal", "Pure White", "Black", "Beige", "Taupe", "Brown", "Dark Brown",
+    "Pale Green", "Sage", "Deep Green", "Light Blue", "Blue", "Navy", "Peach",
+    "Terracotta", "Red", "Yellow", "Orange",
+]
+
 def rgb_to_hex(rgb):
     """Convert RGB tuple to hex color"""
     return '#{:02x}{:02x}{:02x}'.format(rgb[0], rgb[1], rgb[2])
@@ -42,13 +54,139 @@ def quantize_color_to_palette(rgb, palette=TILE_COLORS):
         return sum((a-b)**2 for a, b in zip(c1, c2))
     return min(palette, key=lambda c: dist(rgb, c))
 
-def create_mosaic_preview_with_analysis(input_path, output_path=None, max_colors=20, color_reduction=32):
+# Tiles processed per chunk when quantizing and analyzing the tile grid
+CHUNK_TILES = 1 << 20
+
+# Tiles quantized per batch, keeps the (tiles x palette) cost table small
+QUANTIZE_CHUNK = 1 << 16
+
+# Murals above this many tiles have their images streamed to PNG in bands
+# instead of being built in memory
+STREAM_TILES = 1 << 16
+
+PREVIEW_SCALE = 10          # Preview pixels per tile side
+PALETTE_MAX_WIDTH = 2000    # Widest color palette bar chart, in pixels
+
+def quantize_to_indices(pixels, palette=TILE_COLORS):
+    """Quantize an (..., 3) pixel array to uint8 indices of the nearest palette colors."""
+    # |p - c|^2 = |p|^2 - 2 p.c + |c|^2, and |p|^2 is the same for every candidate.
+    # All terms stay well inside float32's exact integer range.
+    palette = np.asarray(palette, dtype=np.float32)
+    cost = pixels.astype(np.float32) @ (-2 * palette.T) + (palette * palette).sum(axis=1)
+    return cost.argmin(axis=-1).astype(np.uint8)
+
+def describe_color(color):
+    """Rough color family used in the tile requirements report"""
+    r, g, b = color
+    if r < 50 and g < 50 and b < 50:
+        return "Black/Dark Gray"
+    elif r > 200 and g > 200 and b > 200:
+        return "White/Light Gray"
+    elif r > g and r > b:
+        return "Reddish"
+    elif g > r and g > b:
+        return "Greenish"
+    elif b > r and b > g:
+        return "Bluish"
+    return "Gray"
+
+def simplify_color(color):
+    """Map a tile color to black, white, one of three standard grays, or leave it as is"""
+    r, g, b = color
+    if all(c < 50 for c in (r, g, b)):
+        return (0, 0, 0)  # Pure black
+    elif all(c > 200 for c in (r, g, b)):
+        return (255, 255, 255)  # Pure white
+    elif max(r, g, b) - min(r, g, b) < 30:
+        # It's a gray - pick closest standard gray
+        avg = (r + g + b) // 3
+        if avg < 85:
+            return (64, 64, 64)  # Dark gray
+        elif avg < 170:
+            return (128, 128, 128)  # Medium gray
+        return (192, 192, 192)  # Light gray
+    return color
+
+def build_tile_grid(pixelated, grid_path, palette=TILE_COLORS):
+    """
+    Quantize a pixelated image into a memory-mapped uint8 grid of palette indices,
+    a band of rows at a time so memory stays flat for very large murals.
+    """
+    width, height = pixelated.size
+    grid = np.lib.format.open_memmap(grid_path, mode='w+', dtype=np.uint8, shape=(height, width))
+    rows = max(1, QUANTIZE_CHUNK // width)
+    for y in range(0, height, rows):
+        band = pixelated.crop((0, y, width, min(height, y + rows)))
+        grid[y:y + band.height] = quantize_to_indices(np.asarray(band), palette)
+    grid.flush()
+    return grid
+
+def count_tiles(grid, palette_size=len(TILE_COLORS)):
+    """Per-palette-index tile counts, streamed over the grid in fixed-size chunks"""
+    flat = grid.reshape(-1)
+    counts = np.zeros(palette_size, dtype=np.int64)
+    for start in range(0, len(flat), CHUNK_TILES):
+        counts += np.bincount(flat[start:start + CHUNK_TILES], minlength=palette_size)
+    return counts
+
+def flat_palette(colors):
+    """Flatten a list of RGB tuples into the [r, g, b, r, g, b, ...] form Pillow expects"""
+    return [c for color in colors for c in color]
+
+def indexed_image(grid, palette=TILE_COLORS):
+    """
+    Wrap an index grid as a 1-byte-per-pixel 'P' mode image with the given palette,
+    copying it in bands so the memory-mapped grid is never expanded to RGB.
+    """
+    height, width = grid.shape
+    img = Image.new('L', (width, height))
+    rows = max(1, CHUNK_TILES // width)
+    for y in range(0, height, rows):
+        img.paste(Image.fromarray(np.ascontiguousarray(grid[y:y + rows]), 'L'), (0, y))
+    img.putpalette(flat_palette(palette))
+    return img
+
+def png_chunk(f, kind, data):
+    f.write(struct.pack('>I', len(data)) + kind + data)
+    f.write(struct.pack('>I', zlib.crc32(kind + data)))
+
+def write_indexed_png(path, grid, palette=TILE_COLORS, scale=1, compress_level=6):
+    """
+    Write an index grid as a palette PNG, each tile scaled to scale x scale pixels.
+    Rows are expanded and compressed a band at a time, so memory use does not
+    depend on the size of the image.
+    """
+    height, width = grid.shape
+    palette = list(palette)
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        png_chunk(f, b'IHDR', struct.pack('>IIBBBBB', width * scale, height * scale, 8, 3, 0, 0, 0))
+        png_chunk(f, b'PLTE', bytes(flat_palette(palette)))
+        compressor = zlib.compressobj(compress_level)
+        rows = max(1, CHUNK_TILES // (width * scale * scale))
+        for y in range(0, height, rows):
+            band = np.repeat(np.repeat(grid[y:y + rows], scale, axis=0), scale, axis=1)
+            scanlines = np.zeros((band.shape[0], band.shape[1] + 1), dtype=np.uint8)  # Filter byte 0 (None)
+            scanlines[:, 1:] = band
+            data = compressor.compress(scanlines.tobytes())
+            if data:
+                png_chunk(f, b'IDAT', data)
+        png_chunk(f, b'IDAT', compressor.flush())
+        png_chunk(f, b'IEND', b'')
+    return path
+
+def create_mosaic_preview_with_analysis(input_path, output_path=None, max_colors=20, color_reduction=32,
+                                        mosaic_width=42, mosaic_height=67, writer=None):
     """
-    Create a pixelated preview and analyze colors for a 67x42 tile mosaic
+    Create a pixelated preview and analyze colors for a 67x42 tile mosaic.
+    Images are saved through writer (an OutputWriter); without one, a private
+    writer is flushed before returning. Murals above STREAM_TILES tiles bypass the
+    writer and have their preview images streamed to PNG from the tile grid.
     """
     # Mosaic dimensions (in tiles/pixels)
-    MOSAIC_WIDTH = 42 
-    MOSAIC_HEIGHT = 67   
+    MOSAIC_WIDTH = mosaic_width
+    MOSAIC_HEIGHT = mosaic_height
+    total_tiles = MOSAIC_WIDTH * MOSAIC_HEIGHT
     
     # Open the input image
     img = Image.open(input_path)
@@ -60,23 +198,36 @@ def create_mosaic_preview_with_analysis(input_path, output_path=None, max_colors
     # Resize to mosaic dimensions
     pixelated = img.resize((MOSAIC_WIDTH, MOSAIC_HEIGHT), Image.Resampling.LANCZOS)
     
-    # Quantize colors to tile palette
-    pixels = list(pixelated.getdata())
-    quantized_pixels = [quantize_color_to_palette(p, TILE_COLORS) for p in pixels]
+    # Generate output filenames
+    if output_path is None:
+        base, ext = os.path.splitext(input_path)
+        output_path = f"{base}_mosaic_preview.png"
     
-    # Create new image with quantized colors
-    quantized_img = Image.new('RGB', (MOSAIC_WIDTH, MOSAIC_HEIGHT))
-    quantized_img.putdata(quantized_pixels)
+    # Quantize colors to tile palette, stored as a memory-mapped grid of palette indices
+    # Companion files are named from the output path without its extension
+    output_base = os.path.splitext(output_path)[0]
+    grid_path = f"{output_base}_tiles.npy"
+    grid = build_tile_grid(pixelated, grid_path, TILE_COLORS)
+    del img, pixelated
     
     # Analyze colors
-    color_counts = Counter(quantized_pixels)
+    counts = count_tiles(grid, len(TILE_COLORS))
     
-    # Sort colors by frequency
-    sorted_colors = sorted(color_counts.items(), key=lambda x: x[1], reverse=True)
+    # Sort colors by frequency (ties keep first-seen order in the grid, like Counter)
+    first_seen = {}
+    for start in range(0, total_tiles, CHUNK_TILES):
+        if len(first_seen) == np.count_nonzero(counts):
+            break
+        chunk = grid.reshape(-1)[start:start + CHUNK_TILES]
+        values, positions = np.unique(chunk, return_index=True)
+        for value, position in zip(values.tolist(), positions.tolist()):
+            first_seen.setdefault(value, start + position)
+    order = sorted(first_seen, key=lambda i: (-counts[i], first_seen[i]))
+    sorted_colors = [(TILE_COLORS[i], int(counts[i])) for i in order]
     
     # Group similar colors (optional - for now we'll show exact colors)
     print("\n=== MOSAIC COLOR ANALYSIS ===")
-    print(f"Total tiles: {MOSAIC_WIDTH * MOSAIC_HEIGHT:,}")
+    print(f"Total tiles: {total_tiles:,}")
     print(f"Unique colors after quantization: {len(sorted_colors)}")
     print("\n=== TILE REQUIREMENTS ===")
     
@@ -85,112 +236,104 @@ def create_mosaic_preview_with_analysis(input_path, output_path=None, max_colors
     total_shown = 0
     
     for i, (color, count) in enumerate(sorted_colors[:colors_to_show]):
-        percentage = (count / len(pixels)) * 100
+        percentage = (count / total_tiles) * 100
         hex_color = rgb_to_hex(color)
         total_shown += count
-        
-        # Create a color description
-        r, g, b = color
-        if r < 50 and g < 50 and b < 50:
-            desc = "Black/Dark Gray"
-        elif r > 200 and g > 200 and b > 200:
-            desc = "White/Light Gray"
-        elif r > g and r > b:
-            desc = "Reddish"
-        elif g > r and g > b:
-            desc = "Greenish"
-        elif b > r and b > g:
-            desc = "Bluish"
-        else:
-            desc = "Gray"
-        
+        desc = describe_color(color)
         print(f"{i+1:2d}. {hex_color} ({desc:15s}): {count:4d} tiles ({percentage:5.1f}%)")
     
     if len(sorted_colors) > colors_to_show:
-        remaining = len(pixels) - total_shown
-        print(f"\n    Other colors: {remaining} tiles ({(remaining/len(pixels)*100):.1f}%)")
+        remaining = total_tiles - total_shown
+        print(f"\n    Other colors: {remaining} tiles ({(remaining/total_tiles*100):.1f}%)")
     
     # Create color palette image
     palette_height = 50
-    palette_img = Image.new('RGB', (MOSAIC_WIDTH * 10, palette_height * min(10, len(sorted_colors))))
+    palette_width = min(MOSAIC_WIDTH * 10, PALETTE_MAX_WIDTH)
+    palette_img = Image.new('P', (palette_width, palette_height * min(10, len(sorted_colors))),
+                            TILE_COLORS.index((0, 0, 0)))
+    palette_img.putpalette(flat_palette(TILE_COLORS))
+    draw = ImageDraw.Draw(palette_img)
     
-    for i, (color, count) in enumerate(sorted_colors[:10]):
+    for i, index in enumerate(order[:10]):
         # Draw a bar for each color
-        for y in range(i * palette_height, (i + 1) * palette_height):
-            for x in range(int(MOSAIC_WIDTH * 10 * count / len(pixels))):
-                palette_img.putpixel((x, y), color)
-    
-    # Scale up preview for viewing
-    preview_size = (MOSAIC_WIDTH * 10, MOSAIC_HEIGHT * 10)
-    preview = quantized_img.resize(preview_size, Image.Resampling.NEAREST)
+        bar_width = int(palette_width * counts[index] / total_tiles)
+        if bar_width > 0:
+            draw.rectangle([0, i * palette_height, bar_width - 1, (i + 1) * palette_height - 1], fill=index)
     
-    # Generate output filenames
-    if output_path is None:
-        base, ext = os.path.splitext(input_path)
-        output_path = f"{base}_mosaic_preview.png"
-    
-    # Save images
-    preview.save(output_path)
-    pixel_perfect_path = output_path.replace('.png', '_exact.png')
-    quantized_img.save(pixel_perfect_path)
-    palette_path = output_path.replace('.png', '_palette.png')
-    palette_img.save(palette_path)
-    
-    print(f"\n=== FILES SAVED ===")
-    print(f"Preview: {output_path}")
-    print(f"Exact pixels: {pixel_perfect_path}")
-    print(f"Color palette: {palette_path}")
-    
-    # Suggest tile groupings
-    print("\n=== SUGGESTED TILE GROUPINGS ===")
-    blacks = sum(count for color, count in sorted_colors if all(c < 50 for c in color))
-    whites = sum(count for color, count in sorted_colors if all(c > 200 for c in color))
-    grays = sum(count for color, count in sorted_colors if 50 <= min(color) and max(color) <= 200 and max(color) - min(color) < 30)
-    colors = len(pixels) - blacks - whites - grays
-    
-    print(f"Black tiles needed: ~{blacks:,}")
-    print(f"White tiles needed: ~{whites:,}")
-    print(f"Gray tiles needed: ~{grays:,}")
-    print(f"Colored tiles needed: ~{colors:,}")
-    
-    # Generate a simplified color map for easier tile selection
-    print("\n=== SIMPLIFIED COLOR MAP ===")
-    simplified = quantized_img.copy()
-    
-    # Map each pixel to simplified colors
-    for x in range(MOSAIC_WIDTH):
-        for y in range(MOSAIC_HEIGHT):
-            r, g, b = simplified.getpixel((x, y))
-            
-            # Simplify to basic colors
-            if all(c < 50 for c in (r, g, b)):
-                simplified.putpixel((x, y), (0, 0, 0))  # Pure black
-            elif all(c > 200 for c in (r, g, b)):
-                simplified.putpixel((x, y), (255, 255, 255))  # Pure white
-            elif max(r, g, b) - min(r, g, b) < 30:
-                # It's a gray - pick closest standard gray
-                avg = (r + g + b) // 3
-                if avg < 85:
-                    simplified.putpixel((x, y), (64, 64, 64))  # Dark gray
-                elif avg < 170:
-                    simplified.putpixel((x, y), (128, 128, 128))  # Medium gray
-                else:
-                    simplified.putpixel((x, y), (192, 192, 192))  # Light gray
-    
-    # Save simplified version
-    simplified_preview = simplified.resize(preview_size, Image.Resampling.NEAREST)
-    simplified_path = output_path.replace('.png', '_simplified.png')
-    simplified_preview.save(simplified_path)
-    print(f"Simplified preview: {simplified_path}")
+    # A private writer is flushed on the way out, even if a later step fails
+    with (OutputWriter() if writer is None else nullcontext(writer)) as writer:
+        streamed = total_tiles > STREAM_TILES
+        simplified_palette = [simplify_color(c) for c in TILE_COLORS]
+        
+        # Save images
+        if streamed:
+            # Written straight from the memory-mapped grid, never held in memory; always PNG
+            preview_path = write_indexed_png(f"{output_base}.png", grid, TILE_COLORS, PREVIEW_SCALE,
+                                             writer.compress_level)
+            pixel_perfect_path = write_indexed_png(f"{output_base}_exact.png", grid, TILE_COLORS, 1,
+                                                   writer.compress_level)
+        else:
+            # Scale up preview for viewing, all in indexed form
+            quantized_img = indexed_image(grid, TILE_COLORS)
+            preview_size = (MOSAIC_WIDTH * PREVIEW_SCALE, MOSAIC_HEIGHT * PREVIEW_SCALE)
+            preview = quantized_img.resize(preview_size, Image.Resampling.NEAREST)
+            preview_path = writer.save(preview, output_path, preview=True)
+            pixel_perfect_path = writer.save(quantized_img, f"{output_base}_exact.png")
+            del quantized_img
+        palette_path = writer.save(palette_img, f"{output_base}_palette.png", preview=True)
+        
+        print(f"\n=== FILES SAVED ===")
+        print(f"Preview: {preview_path}")
+        print(f"Exact pixels: {pixel_perfect_path}")
+        print(f"Color palette: {palette_path}")
+        print(f"Tile index grid: {grid_path}")
+        
+        # Suggest tile groupings
+        print("\n=== SUGGESTED TILE GROUPINGS ===")
+        blacks = sum(count for color, count in sorted_colors if all(c < 50 for c in color))
+        whites = sum(count for color, count in sorted_colors if all(c > 200 for c in color))
+        grays = sum(count for color, count in sorted_colors if 50 <= min(color) and max(color) <= 200 and max(color) - min(color) < 30)
+        colors = total_tiles - blacks - whites - grays
+        
+        print(f"Black tiles needed: ~{blacks:,}")
+        print(f"White tiles needed: ~{whites:,}")
+        print(f"Gray tiles needed: ~{grays:,}")
+        print(f"Colored tiles needed: ~{colors:,}")
+        
+        # Generate a simplified color map for easier tile selection
+        print("\n=== SIMPLIFIED COLOR MAP ===")
+        # Same indices as the preview, only the palette changes
+        simplified_path = f"{output_base}_simplified.png"
+        if streamed:
+            simplified_path = write_indexed_png(simplified_path, grid, simplified_palette, PREVIEW_SCALE,
+                                                writer.compress_level)
+        else:
+            simplified_preview = preview.copy()
+            simplified_preview.putpalette(flat_palette(simplified_palette))
+            del preview
+        
+            # Save simplified version
+            simplified_path = writer.save(simplified_preview, simplified_path, preview=True)
+        print(f"Simplified preview: {simplified_path}")
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python mosaic_analyzer.py <input_image> [output_image] [color_reduction]")
+        print("Usage: python mosaic_analyzer.py <input_image> [output_image] [color_reduction] [width] [height] [preview_format] [compress_level]")
         print("color_reduction: Number of color levels to reduce to (default: 32)")
+        print("width, height: Mosaic size in tiles (default: 42 x 67)")
+        print("preview_format: png (default), webp, jpeg; compress_level: PNG compression 0-9 (default: 6)")
+        print(f"Murals over {STREAM_TILES:,} tiles are written as PNG in bands to keep memory bounded")
+        print("Example: python mosaic_analyzer.py image.jpg wall_preview.png 32 1260 2010")
         sys.exit(1)
     
     input_file = sys.argv[1]
     output_file = sys.argv[2] if len(sys.argv) > 2 else None
     color_reduction = int(sys.argv[3]) if len(sys.argv) > 3 else 32
+    width = int(sys.argv[4]) if len(sys.argv) > 4 else 42
+    height = int(sys.argv[5]) if len(sys.argv) > 5 else 67
+    preview_format = sys.argv[6] if len(sys.argv) > 6 else 'png'
+    compress_level = int(sys.argv[7]) if len(sys.argv) > 7 else 6
     
-    create_mosaic_preview_with_analysis(input_file, output_file, color_reduction=color_reduction)
+    with OutputWriter(compress_level=compress_level, preview_format=preview_format) as writer:
+        create_mosaic_preview_with_analysis(input_file, output_file, color_reduction=color_reduction,
+                                            mosaic_width=width, mosaic_height=height, writer=writer)
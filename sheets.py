@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+from PIL import Image, ImageDraw, ImageFont
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import csv
+import sys
+import os
+
+from preview2 import TILE_COLORS, TILE_NAMES, rgb_to_hex, flat_palette
+
+SHEET_SIZE = 12        # Tiles per side of a mesh-backed sheet
+CELL_SIZE = 40         # Chart pixels per tile
+HEADER_HEIGHT = 30     # Chart pixels reserved for the sheet label
+
+# Chart palette: the tile colors followed by the chart's own ink colors
+GRID_LINE = len(TILE_COLORS)
+PAPER = len(TILE_COLORS) + 1
+INK = len(TILE_COLORS) + 2
+CHART_PALETTE = flat_palette(TILE_COLORS + [(90, 90, 90), (255, 255, 255), (0, 0, 0)])
+
+# Read-only tile grid shared by the worker processes
+_grid = None
+
+def _open_grid(grid_path):
+    global _grid
+    _grid = np.load(grid_path, mmap_mode='r')
+
+def sheet_layout(grid_shape, sheet_size=SHEET_SIZE):
+    """Number of sheet rows and columns needed to cover a grid; edge sheets may be partial"""
+    height, width = grid_shape
+    return -(-height // sheet_size), -(-width // sheet_size)
+
+def sheet_name(sheet_row, sheet_col):
+    return f"R{sheet_row + 1:03d}-C{sheet_col + 1:03d}"
+
+def text_index(color):
+    """Chart ink that stays readable on top of a tile color"""
+    r, g, b = color
+    return INK if 0.299 * r + 0.587 * g + 0.114 * b > 128 else PAPER
+
+# Legend number stamps, rendered once per process and pasted into every chart
+_label_masks = {}
+
+def label_mask(number):
+    if number not in _label_masks:
+        mask = Image.new('1', (CELL_SIZE, CELL_SIZE), 0)
+        ImageDraw.Draw(mask).text((CELL_SIZE // 2, CELL_SIZE // 2), str(number), fill=1,
+                                  font=ImageFont.load_default(), anchor='mm')
+        _label_masks[number] = mask
+    return _label_masks[number]
+
+def render_sheet_chart(tiles, title):
+    """
+    Numbered placement chart for one sheet as a 'P' mode image.
+    Each cell shows its tile color and legend number (palette index + 1).
+    """
+    rows, cols = tiles.shape
+    pixels = np.full((rows * CELL_SIZE + HEADER_HEIGHT + 1, cols * CELL_SIZE + 1), PAPER, dtype=np.uint8)
+    pixels[HEADER_HEIGHT:HEADER_HEIGHT + rows * CELL_SIZE, :cols * CELL_SIZE] = \
+        np.repeat(np.repeat(tiles, CELL_SIZE, axis=0), CELL_SIZE, axis=1)
+    chart = Image.fromarray(pixels, 'L')
+    chart.putpalette(CHART_PALETTE)
+
+    draw = ImageDraw.Draw(chart)
+    draw.text((4, 8), title, fill=INK, font=ImageFont.load_default())
+
+    for y in range(rows + 1):
+        draw.line([(0, HEADER_HEIGHT + y * CELL_SIZE), (cols * CELL_SIZE, HEADER_HEIGHT + y * CELL_SIZE)], fill=GRID_LINE)
+    for x in range(cols + 1):
+        draw.line([(x * CELL_SIZE, HEADER_HEIGHT), (x * CELL_SIZE, HEADER_HEIGHT + rows * CELL_SIZE)], fill=GRID_LINE)
+
+    for y in range(rows):
+        for x in range(cols):
+            index = int(tiles[y, x])
+            box = (x * CELL_SIZE, HEADER_HEIGHT + y * CELL_SIZE)
+            box += (box[0] + CELL_SIZE, box[1] + CELL_SIZE)
+            chart.paste(text_index(TILE_COLORS[index]), box, label_mask(index + 1))
+
+    return chart
+
+def write_sheet_legend(path, title, tiles, counts, wall_origin):
+    """Per-sheet legend with tile counts and row-by-row placement numbers"""
+    rows, cols = tiles.shape
+    top, left = wall_origin
+    with open(path, 'w') as f:
+        f.write(f"Sheet {title}: wall rows {top + 1}-{top + rows}, columns {left + 1}-{left + cols}\n")
+        f.write(f"Tiles on sheet: {rows * cols}\n\n")
+        f.write("Legend:\n")
+        for index in np.flatnonzero(counts):
+            f.write(f"  {index + 1:2d}  {TILE_NAMES[index]:15s} {rgb_to_hex(TILE_COLORS[index])}  {counts[index]:4d} tiles\n")
+        f.write("\nPlacement (top to bottom, left to right):\n")
+        for y in range(rows):
+            f.write(f"  Row {y + 1:2d}: " + " ".join(f"{int(i) + 1:2d}" for i in tiles[y]) + "\n")
+
+def export_sheet(task):
+    """Write chart and legend for one sheet; returns its name and per-color counts"""
+    sheet_row, sheet_col, sheet_size, output_dir = task
+    top, left = sheet_row * sheet_size, sheet_col * sheet_size
+    tiles = np.ascontiguousarray(_grid[top:top + sheet_size, left:left + sheet_size])
+    counts = np.bincount(tiles.reshape(-1), minlength=len(TILE_COLORS))
+
+    name = sheet_name(sheet_row, sheet_col)
+    render_sheet_chart(tiles, f"Sheet {name}").save(os.path.join(output_dir, f"sheet_{name}.png"))
+    write_sheet_legend(os.path.join(output_dir, f"sheet_{name}.txt"), name, tiles, counts, (top, left))
+    return name, counts
+
+def export_sheets(grid_path, output_dir=None, sheet_size=SHEET_SIZE, workers=None):
+    """
+    Split a quantized tile grid (the _tiles.npy written by preview2.py) into
+    mesh sheets and write a chart and legend per sheet plus a bill of materials
+    """
+    if sheet_size < 1:
+        raise ValueError(f"sheet_size must be at least 1, got {sheet_size}")
+
+    if output_dir is None:
+        output_dir = grid_path.replace('_tiles.npy', '') + '_sheets'
+    os.makedirs(output_dir, exist_ok=True)
+
+    grid = np.load(grid_path, mmap_mode='r')
+    sheet_rows, sheet_cols = sheet_layout(grid.shape, sheet_size)
+    total_sheets = sheet_rows * sheet_cols
+    print(f"Wall: {grid.shape[1]} x {grid.shape[0]} tiles")
+    print(f"Sheets: {sheet_cols} x {sheet_rows} = {total_sheets:,} sheets of {sheet_size} x {sheet_size}")
+
+    tasks = [(r, c, sheet_size, output_dir) for r in range(sheet_rows) for c in range(sheet_cols)]
+    totals = np.zeros(len(TILE_COLORS), dtype=np.int64)
+    sheets_using = np.zeros(len(TILE_COLORS), dtype=np.int64)
+
+    # Workers map the grid file themselves, so only sheet coordinates are sent over
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, min(64, total_sheets // (4 * workers)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_open_grid, initargs=(grid_path,)) as executor:
+        for done, (name, counts) in enumerate(executor.map(export_sheet, tasks, chunksize=chunksize), start=1):
+            totals += counts
+            sheets_using += counts > 0
+            if done % 500 == 0:
+                print(f"Progress: {done / total_sheets * 100:.1f}%")
+
+    bom_path = os.path.join(output_dir, 'bill_of_materials.csv')
+    with open(bom_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['number', 'name', 'hex', 'tiles', 'sheets'])
+        for index in np.argsort(-totals, kind='stable'):
+            if totals[index]:
+                writer.writerow([index + 1, TILE_NAMES[index], rgb_to_hex(TILE_COLORS[index]),
+                                 int(totals[index]), int(sheets_using[index])])
+
+    print(f"\n=== BILL OF MATERIALS ===")
+    for index in np.argsort(-totals, kind='stable'):
+        if totals[index]:
+            print(f"{index + 1:2d}. {TILE_NAMES[index]:15s} {rgb_to_hex(TILE_COLORS[index])}: "
+                  f"{totals[index]:,} tiles on {sheets_using[index]:,} sheets")
+    print(f"\nSheet charts and legends saved to: {output_dir}")
+    print(f"Bill of materials: {bom_path}")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python sheets.py <tiles.npy> [sheet_size] [output_dir]")
+        print("The tile grid is written by preview2.py next to its preview (<name>_tiles.npy)")
+        print("Example: python sheets.py flower-thrower_mosaic_preview_tiles.npy 12")
+        sys.exit(1)
+
+    grid_file = sys.argv[1]
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else SHEET_SIZE
+    out_dir = sys.argv[3] if len(sys.argv) > 3 else None
+
+    export_sheets(grid_file, out_dir, size)
@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
 from PIL import Image, ImageDraw, ImageFilter
+from contextlib import nullcontext
 import random
 import sys
 import os
 
+from output_writer import OutputWriter
+
 TILE_COLORS = [
     (232, 232, 228),  # Off White
     (201, 201, 196),  # Light Gray
@@ -107,10 +110,34 @@ def create_tile_with_texture(size, base_color, rounded=False):
     
     return tile
 
+def simulated_tile_color(base_color):
+    """Pick the tile color for a source pixel, with natural variation between tiles"""
+    # Normalize whites to pure white
+    r, g, b = base_color
+    if r > 230 and g > 230 and b > 230:
+        tile_color = (255, 255, 255)
+    else:
+        # Add natural variation between tiles for non-white colors
+        tile_color = add_tile_variation(base_color, 10)
+    # Snap to nearest available tile color
+    return quantize_color_to_palette(tile_color, TILE_COLORS)
+
+def mosaic_canvas_size(width, height, tile_size, grout_width):
+    """Pixel size of a width x height tile grid including grout lines"""
+    return (width * tile_size + (width + 1) * grout_width,
+            height * tile_size + (height + 1) * grout_width)
+
+def tile_position(x, y, tile_size, grout_width):
+    """Top-left pixel of tile (x, y) on a grout canvas"""
+    return (x * (tile_size + grout_width) + grout_width,
+            y * (tile_size + grout_width) + grout_width)
+
 def create_mosaic_with_grout(input_path, output_path=None, tile_size=40, grout_width=3, 
-                            grout_color=(128, 128, 128), tile_style='square'):
+                            grout_color=(128, 128, 128), tile_style='square', writer=None):
     """
-    Create a realistic mosaic simulation with grout lines and tile texture
+    Create a realistic mosaic simulation with grout lines and tile texture.
+    Images are saved through writer (an OutputWriter) so encoding can overlap
+    with later work; without one, a private writer is flushed before returning.
     """
     # Mosaic dimensions in tiles
     MOSAIC_WIDTH = 42
@@ -125,8 +152,7 @@ def create_mosaic_with_grout(input_path, output_path=None, tile_size=40, grout_w
     pixelated = img.resize((MOSAIC_WIDTH, MOSAIC_HEIGHT), Image.Resampling.LANCZOS)
     
     # Calculate output image size
-    output_width = MOSAIC_WIDTH * tile_size + (MOSAIC_WIDTH + 1) * grout_width
-    output_height = MOSAIC_HEIGHT * tile_size + (MOSAIC_HEIGHT + 1) * grout_width
+    output_width, output_height = mosaic_canvas_size(MOSAIC_WIDTH, MOSAIC_HEIGHT, tile_size, grout_width)
     
     # Create output image with grout color background
     output = Image.new('RGB', (output_width, output_height), grout_color)
@@ -138,25 +164,14 @@ def create_mosaic_with_grout(input_path, output_path=None, tile_size=40, grout_w
     for y in range(MOSAIC_HEIGHT):
         for x in range(MOSAIC_WIDTH):
             # Get the color for this tile
-            base_color = pixelated.getpixel((x, y))
-            
-            # Normalize whites to pure white
-            r, g, b = base_color
-            if r > 230 and g > 230 and b > 230:
-                tile_color = (255, 255, 255)
-            else:
-                # Add natural variation between tiles for non-white colors
-                tile_color = add_tile_variation(base_color, 10)
-            # Snap to nearest available tile color
-            tile_color = quantize_color_to_palette(tile_color, TILE_COLORS)
+            tile_color = simulated_tile_color(pixelated.getpixel((x, y)))
             
             # Create the tile with texture
             tile = create_tile_with_texture(tile_size, tile_color, 
                                            rounded=(tile_style == 'penny'))
             
             # Calculate position including grout
-            pos_x = x * (tile_size + grout_width) + grout_width
-            pos_y = y * (tile_size + grout_width) + grout_width
+            pos_x, pos_y = tile_position(x, y, tile_size, grout_width)
             
             # Paste the tile
             if tile_style == 'penny' and tile.mode == 'RGBA':
@@ -187,14 +202,15 @@ def create_mosaic_with_grout(input_path, output_path=None, tile_size=40, grout_w
         base, ext = os.path.splitext(input_path)
         output_path = f"{base}_mosaic_simulation_{tile_style}.png"
     
-    output.save(output_path, quality=95)
-    
-    # Also create a smaller preview version
-    preview_width = 800
-    preview_height = int(output_height * (preview_width / output_width))
-    preview = output.resize((preview_width, preview_height), Image.Resampling.LANCZOS)
-    preview_path = output_path.replace('.png', '_preview.png')
-    preview.save(preview_path)
+    # A private writer is flushed on the way out, even if rendering the preview fails
+    with (OutputWriter() if writer is None else nullcontext(writer)) as writer:
+        writer.save(output, output_path)
+        
+        # Also create a smaller preview version
+        preview_width = 800
+        preview_height = int(output_height * (preview_width / output_width))
+        preview = output.resize((preview_width, preview_height), Image.Resampling.LANCZOS)
+        preview_path = writer.save(preview, output_path.replace('.png', '_preview.png'), preview=True)
     
     print(f"\nMosaic simulation saved to: {output_path}")
     print(f"Preview version saved to: {preview_path}")
@@ -206,7 +222,7 @@ def create_mosaic_with_grout(input_path, output_path=None, tile_size=40, grout_w
     print(f"\nPhysical dimensions: {physical_width}\" x {physical_height}\"")
     print(f"With {grout_width}px grout (simulating ~1/8\" grout lines)")
 
-def create_multiple_styles(input_path):
+def create_multiple_styles(input_path, writer=None):
     """Create simulations with different tile styles and grout colors"""
     styles = [
         ('square', (32, 32, 32), 'gray'),
@@ -215,24 +231,31 @@ def create_multiple_styles(input_path):
         ('penny', (128, 128, 128), 'gray')
     ]
     
-    for tile_style, grout_color, grout_name in styles:
-        print(f"\n=== Creating {tile_style} tiles with {grout_name} grout ===")
-        output_name = f"{os.path.splitext(input_path)[0]}_mosaic_{tile_style}_{grout_name}_grout.png"
-        create_mosaic_with_grout(input_path, output_name, 
-                               tile_style=tile_style, grout_color=grout_color)
+    # One shared writer so each variant encodes while the next one renders
+    with (OutputWriter() if writer is None else nullcontext(writer)) as writer:
+        for tile_style, grout_color, grout_name in styles:
+            print(f"\n=== Creating {tile_style} tiles with {grout_name} grout ===")
+            output_name = f"{os.path.splitext(input_path)[0]}_mosaic_{tile_style}_{grout_name}_grout.png"
+            create_mosaic_with_grout(input_path, output_name, 
+                                   tile_style=tile_style, grout_color=grout_color, writer=writer)
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python mosaic_simulator.py <input_image> [style]")
+        print("Usage: python mosaic_simulator.py <input_image> [style] [preview_format] [compress_level]")
         print("Styles: square (default), penny, all")
+        print("Preview formats: png (default), webp, jpeg")
+        print("Compress level: PNG compression 0-9 (default: 6, lower is faster)")
         print("Example: python mosaic_simulator.py image.jpg square")
-        print("         python mosaic_simulator.py image.jpg all")
+        print("         python mosaic_simulator.py image.jpg all webp 1")
         sys.exit(1)
     
     input_file = sys.argv[1]
     style = sys.argv[2] if len(sys.argv) > 2 else 'square'
+    preview_format = sys.argv[3] if len(sys.argv) > 3 else 'png'
+    compress_level = int(sys.argv[4]) if len(sys.argv) > 4 else 6
     
-    if style == 'all':
-        create_multiple_styles(input_file)
-    else:
-        create_mosaic_with_grout(input_file, tile_style=style)
\ No newline at end of file
+    with OutputWriter(compress_level=compress_level, preview_format=preview_format) as writer:
+        if style == 'all':
+            create_multiple_styles(input_file, writer=writer)
+        else:
+            create_mosaic_with_grout(input_file, tile_style=style, writer=writer)
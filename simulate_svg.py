@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+from PIL import Image
+import gzip
+import sys
+import os
+
+from simulate2 import simulated_tile_color, mosaic_canvas_size, tile_position
+
+def svg_color(rgb):
+    return '#{:02x}{:02x}{:02x}'.format(*rgb)
+
+def tile_definition(tile_id, size, base_color, tile_style):
+    """
+    SVG group for one tile color, defined once and referenced by every tile of that color.
+    Mirrors create_tile_with_texture: a darker 2px border, a highlight line on the
+    top/left edges and a soft gradient sheen in place of the random texture dots.
+    """
+    r, g, b = base_color
+    is_white = r > 230 and g > 230 and b > 230
+    edge_factor = 0.95 if not is_white else 0.98
+    shade = svg_color(tuple(int(c * edge_factor) for c in base_color))
+    fill = svg_color(base_color)
+
+    if tile_style == 'penny':
+        half = size / 2
+        parts = [f'<circle cx="{half:g}" cy="{half:g}" r="{half - 1:g}" fill="{fill}" stroke="{shade}" stroke-width="2"/>']
+        if not is_white:
+            parts.append(f'<circle cx="{half:g}" cy="{half:g}" r="{half - 2:g}" fill="url(#penny-sheen)"/>')
+    else:
+        parts = [f'<rect x="1" y="1" width="{size - 2}" height="{size - 2}" fill="{fill}" stroke="{shade}" stroke-width="2"/>']
+        if not is_white:
+            highlight = svg_color(tuple(min(255, int(c * 1.05)) for c in base_color))
+            parts.append(f'<path d="M2.5 2V{size - 2}M2 2.5H{size - 2}" stroke="{highlight}"/>')
+            parts.append(f'<rect x="2" y="2" width="{size - 4}" height="{size - 4}" fill="url(#sheen)"/>')
+
+    return f'<g id="{tile_id}">' + ''.join(parts) + '</g>'
+
+def create_mosaic_svg(input_path, output_path=None, tile_size=40, grout_width=3,
+                      grout_color=(128, 128, 128), tile_style='square', grout_texture=True):
+    """
+    Create a resolution-independent SVG mosaic simulation with grout lines.
+    Each tile color is defined once and placed with <use>, so file size grows
+    with the number of tiles rather than with the print resolution.
+    Writing to a .svgz path gzips the output.
+    """
+    # Mosaic dimensions in tiles
+    MOSAIC_WIDTH = 42
+    MOSAIC_HEIGHT = 67
+
+    # Open and prepare the input image
+    img = Image.open(input_path)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    # Resize to mosaic dimensions
+    pixelated = img.resize((MOSAIC_WIDTH, MOSAIC_HEIGHT), Image.Resampling.LANCZOS)
+
+    output_width, output_height = mosaic_canvas_size(MOSAIC_WIDTH, MOSAIC_HEIGHT, tile_size, grout_width)
+
+    print(f"Creating {tile_style} tile mosaic SVG...")
+
+    # Pick tile colors and collect one definition per distinct color
+    tile_ids = {}
+    uses = []
+    for y in range(MOSAIC_HEIGHT):
+        for x in range(MOSAIC_WIDTH):
+            tile_color = simulated_tile_color(pixelated.getpixel((x, y)))
+            if tile_color not in tile_ids:
+                tile_ids[tile_color] = f"t{len(tile_ids)}"
+            pos_x, pos_y = tile_position(x, y, tile_size, grout_width)
+            uses.append(f'<use href="#{tile_ids[tile_color]}" x="{pos_x}" y="{pos_y}"/>')
+
+    # Physical size: one tile pitch per inch, matching the simulation report
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{MOSAIC_WIDTH}in" height="{MOSAIC_HEIGHT}in" '
+        f'viewBox="0 0 {output_width} {output_height}">',
+        '<defs>',
+        '<linearGradient id="sheen" x1="0" y1="0" x2="1" y2="1">'
+        '<stop offset="0" stop-color="#fff" stop-opacity="0.06"/>'
+        '<stop offset="0.5" stop-color="#fff" stop-opacity="0"/>'
+        '<stop offset="1" stop-color="#000" stop-opacity="0.05"/></linearGradient>',
+        '<radialGradient id="penny-sheen" cx="0.35" cy="0.35" r="0.75">'
+        '<stop offset="0" stop-color="#fff" stop-opacity="0.08"/>'
+        '<stop offset="0.7" stop-color="#fff" stop-opacity="0"/>'
+        '<stop offset="1" stop-color="#000" stop-opacity="0.06"/></radialGradient>',
+    ]
+    if grout_texture:
+        # Speckled grout in place of the random grout dots of the raster simulation
+        parts.append(
+            '<filter id="grout" x="0" y="0" width="100%" height="100%">'
+            '<feTurbulence type="fractalNoise" baseFrequency="0.9" numOctaves="1" seed="7" result="noise"/>'
+            '<feColorMatrix in="noise" type="matrix" values="0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0.25 0 0 0 0" result="speckle"/>'
+            '<feMerge><feMergeNode in="SourceGraphic"/><feMergeNode in="speckle"/></feMerge></filter>')
+    parts.extend(tile_definition(tile_id, tile_size, color, tile_style) for color, tile_id in tile_ids.items())
+    parts.append('</defs>')
+
+    grout_filter = ' filter="url(#grout)"' if grout_texture else ''
+    parts.append(f'<rect width="{output_width}" height="{output_height}" fill="{svg_color(grout_color)}"{grout_filter}/>')
+    parts.extend(uses)
+    parts.append('</svg>')
+    svg = '\n'.join(parts) + '\n'
+
+    if output_path is None:
+        base, ext = os.path.splitext(input_path)
+        output_path = f"{base}_mosaic_simulation_{tile_style}.svg"
+
+    if output_path.endswith('.svgz'):
+        with gzip.open(output_path, 'wt', encoding='utf-8') as f:
+            f.write(svg)
+    else:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(svg)
+
+    print(f"\nMosaic SVG saved to: {output_path}")
+    print(f"Tile styles defined: {len(tile_ids)}")
+    print(f"Total tiles: {MOSAIC_WIDTH * MOSAIC_HEIGHT:,}")
+    print(f"\nPhysical dimensions: {MOSAIC_WIDTH}\" x {MOSAIC_HEIGHT}\"")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python simulate_svg.py <input_image> [style] [output.svg|output.svgz]")
+        print("Styles: square (default), penny")
+        print("Example: python simulate_svg.py image.jpg penny image_penny.svgz")
+        sys.exit(1)
+
+    input_file = sys.argv[1]
+    style = sys.argv[2] if len(sys.argv) > 2 else 'square'
+    output_file = sys.argv[3] if len(sys.argv) > 3 else None
+
+    create_mosaic_svg(input_file, output_file, tile_style=style)